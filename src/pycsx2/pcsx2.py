@@ -12,11 +12,145 @@ the emulator to make it more easily extensible, more portable, require less code
 performant.
 """
 import os
+import struct
+import threading
 from array import array
 from enum import IntEnum
 from platform import system
 import socket
 
+try:
+    import numpy as _np
+except ImportError:
+    # numpy is optional; with it, uniform-width batch replies decode without a
+    # Python-level loop over up to 50,000 values.
+    _np = None
+
+# Request header: 4-byte message size, 1-byte command, 4-byte address (little endian).
+_STRUCT_R = struct.Struct("<IBI")
+
+# Write requests append the payload to the header; one Struct per payload width so the
+# whole request is packed into a single contiguous buffer in one call.
+_STRUCT_W = {
+    1: struct.Struct("<IBIB"),
+    2: struct.Struct("<IBIH"),
+    4: struct.Struct("<IBII"),
+    8: struct.Struct("<IBIQ"),
+}
+
+# Batch messages carry one length prefix followed by back-to-back commands, so batch
+# items are packed without the leading size field.
+_STRUCT_LEN = struct.Struct("<I")
+_STRUCT_BATCH_R = struct.Struct("<BI")
+_STRUCT_BATCH_W = {
+    1: struct.Struct("<BIB"),
+    2: struct.Struct("<BIH"),
+    4: struct.Struct("<BII"),
+    8: struct.Struct("<BIQ"),
+}
+
+# Read opcodes are 0..3 and write opcodes 4..7, ordered by payload width, so a single
+# width-to-index table derives both.
+_SIZE_INDEX = {1: 0, 2: 1, 4: 2, 8: 3}
+
+# Plain-int opcode and status constants for the hot path. IPCCommand/IPCResult stay the
+# public vocabulary, but every enum attribute access goes through descriptor machinery
+# that costs more than the lookup it guards.
+_READ_CMD = {1: 0, 2: 1, 4: 2, 8: 3}  # READ8, READ16, READ32, READ64
+_WRITE_CMD = {1: 4, 2: 5, 4: 6, 8: 7}  # WRITE8, WRITE16, WRITE32, WRITE64
+_IPC_FAIL = 0xFF  # IPCResult.IPC_FAIL
+
+# Addresses are 32-bit little endian, patched into prebuilt request templates.
+_STRUCT_ADDR = struct.Struct("<I")
+
+if _np is not None:
+    _NP_DTYPE = {1: _np.uint8, 2: _np.uint16, 4: _np.uint32, 8: _np.uint64}
+
+# Lazily allocated buffers start at one page and double as needed, capped at the
+# protocol maxima.
+_MIN_BUFFER_SIZE = 4096
+
+# Read replies have a fixed size per width (4-byte length, 1 status byte, the value),
+# so the whole reply can be requested in one recv without parsing the prefix first.
+_REPLY_LEN = {1: 6, 2: 7, 4: 9, 8: 13}
+
+# Single-field codecs keyed by payload width; Struct instances keep the parsed format
+# cached and pack/unpack through a C fast path.
+_TO = {
+    1: struct.Struct("<B"),
+    2: struct.Struct("<H"),
+    4: struct.Struct("<I"),
+    8: struct.Struct("<Q"),
+}
+
+# MSG_WAITALL lets one recv syscall block until the whole remaining reply is in,
+# instead of waking up once per arriving segment. Not available everywhere (e.g. some
+# Windows setups); 0 degrades to plain recv semantics.
+_MSG_WAITALL = getattr(socket, "MSG_WAITALL", 0)
+
+# Kernel-level 1 second I/O timeout: SO_RCVTIMEO/SO_SNDTIMEO take a timeval on POSIX
+# and a DWORD of milliseconds on Windows. Applying the timeout in the kernel keeps the
+# socket in plain blocking mode, so each recv/send is one direct syscall instead of
+# going through the interpreter's select-based wait path.
+if system() == "Windows":
+    _SOCK_TIMEOUT: int | bytes = 1000
+else:
+    _SOCK_TIMEOUT = struct.pack("@ll", 1, 0)
+
+# The socket family and path never change at runtime, so resolve them once at import
+# instead of querying the platform on every (re)connect.
+if system() == "Windows":
+    _SOCK_FAMILY = socket.AF_INET
+    _SOCK_NAME = None  # Derived from the slot at connect time.
+elif system() == "Linux":
+    _SOCK_FAMILY = socket.AF_UNIX
+    _SOCK_NAME = os.environ.get("XDG_RUNTIME_DIR", "/tmp") + "/pcsx2.sock"
+elif system() == "Darwin":
+    _SOCK_FAMILY = socket.AF_UNIX
+    _SOCK_NAME = os.environ.get("TMPDIR", "/tmp") + "/pcsx2.sock"
+else:
+    _SOCK_FAMILY = socket.AF_UNIX
+    _SOCK_NAME = "/tmp/pcsx2.sock"
+
+
+def _configure_socket(sock: socket.socket) -> None:
+    # IPC throughput peaks with socket buffers around 64 KiB; the defaults are often
+    # far larger and hurt cache locality for our small messages.
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 65536)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 65536)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    sock.setblocking(True)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVTIMEO, _SOCK_TIMEOUT)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDTIMEO, _SOCK_TIMEOUT)
+
+
+def _connect_unix(slot: int) -> socket.socket:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        _configure_socket(sock)
+        sock.connect(_SOCK_NAME)
+    except socket.error:
+        sock.close()
+        raise
+    return sock
+
+
+def _connect_inet(slot: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        _configure_socket(sock)
+        # Requests are well under Nagle's threshold; don't let the stack delay them.
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.connect(("127.0.0.1", slot))
+    except socket.error:
+        sock.close()
+        raise
+    return sock
+
+
+# Specialized per platform at import; the reconnect path carries no OS branching.
+_connect = _connect_inet if _SOCK_FAMILY == socket.AF_INET else _connect_unix
+
 
 class Pine:
     """ Exposes PS2 memory within a running instance of the PCSX2 emulator using the Pine IPC Protocol. """
@@ -66,156 +200,314 @@ class Pine:
         if not 0 < slot <= 65536:
             raise ValueError("Provided slot number is outside valid range")
         self._slot: int = slot
-        self._sock: socket.socket
-        self._sock_state: bool = False
-        self.ret_buffer = array("B", [0]*self.MAX_IPC_RETURN_SIZE)
-        self.ipc_buffer = array("B", [0]*self.MAX_IPC_SIZE)
-        self.batch_arg_place = array("I", [0]*self.MAX_BATCH_REPLY_COUNT)
+        self._sock: socket.socket | None = None
+        # The IPC buffers start small and grow on demand; a client doing only scalar
+        # reads and writes never pays for the full megabyte the batch limits imply.
+        self._ret_buffer: bytearray | None = None
+        self._ipc_buffer: bytearray | None = None
+        self._ret_mv: memoryview | None = None
+        self._ipc_mv: memoryview | None = None
+        # array from a zeroed bytes object is a straight calloc-and-copy; building it
+        # from [0]*N first materializes a 50,000-element list of boxed ints.
+        if _np is not None:
+            self.batch_arg_place = _np.zeros(self.MAX_BATCH_REPLY_COUNT, dtype=_np.uint32)
+        else:
+            self.batch_arg_place = array("I", bytes(4 * self.MAX_BATCH_REPLY_COUNT))
+        # Prebuilt 9-byte read requests, one per width; only the address is patched in
+        # per call so the specialized read methods skip header packing entirely.
+        self._read_req = {
+            size: bytearray(_STRUCT_R.pack(9, command, 0))
+            for size, command in _READ_CMD.items()
+        }
         self._init_socket()
 
+    @property
+    def ipc_buffer(self) -> bytearray:
+        """ The request staging buffer, allocated on first use. """
+        self._ensure_ipc(_MIN_BUFFER_SIZE)
+        return self._ipc_buffer
+
+    @property
+    def ret_buffer(self) -> bytearray:
+        """ The reply buffer, allocated on first use. """
+        self._ensure_ret(_MIN_BUFFER_SIZE)
+        return self._ret_buffer
+
+    def _ensure_ipc(self, size: int) -> None:
+        buf = self._ipc_buffer
+        if buf is not None and len(buf) >= size:
+            return
+        grown = _MIN_BUFFER_SIZE if buf is None else len(buf) * 2
+        new = bytearray(min(max(size, grown), self.MAX_IPC_SIZE))
+        if buf is not None:
+            new[:len(buf)] = buf
+        self._ipc_buffer = new
+        self._ipc_mv = memoryview(new)
+
+    def _ensure_ret(self, size: int) -> None:
+        buf = self._ret_buffer
+        if buf is not None and len(buf) >= size:
+            return
+        grown = _MIN_BUFFER_SIZE if buf is None else len(buf) * 2
+        new = bytearray(min(max(size, grown), self.MAX_IPC_RETURN_SIZE))
+        if buf is not None:
+            new[:len(buf)] = buf
+        self._ret_buffer = new
+        self._ret_mv = memoryview(new)
+
+    def relax(self) -> None:
+        """ Release the IPC buffers so memory retained after a large batch goes back to
+        the allocator; they are re-created on the next operation. """
+        self._ipc_buffer = self._ret_buffer = None
+        self._ipc_mv = self._ret_mv = None
 
     def _init_socket(self) -> None:
-        if system() == "Windows":
-            socket_family = socket.AF_INET
-            socket_name = ("127.0.0.1", self._slot)
-        elif system() == "Linux":
-            socket_family = socket.AF_UNIX
-            socket_name = os.environ.get("XDG_RUNTIME_DIR", "/tmp")
-            socket_name += "/pcsx2.sock"
-        elif system() == "Darwin":
-            socket_family = socket.AF_UNIX
-            socket_name = os.environ.get("TMPDIR", "/tmp")
-            socket_name += "/pcsx2.sock"
-        else:
-            socket_family = socket.AF_UNIX
-            socket_name = "/tmp/pcsx2.sock"
-
+        # Only publish the socket once it is connected; a failed connect must not leave
+        # a dead socket behind for read/write to trip over.
         try:
-            self._sock = socket.socket(socket_family, socket.SOCK_STREAM)
-            self._sock.settimeout(1.0)
-            self._sock.connect(socket_name)
+            self._sock = _connect(self._slot)
         except socket.error:
-            self._sock.close()
-            self._sock_state = False
             return
 
-        self._sock_state = True
-
     def read(self, data_size: DataSize, address: int) -> bytes:
-        if data_size is Pine.DataSize.INT8:
-            request = Pine._create_request(Pine.IPCCommand.READ8, address, 9)
-        elif data_size is Pine.DataSize.INT16:
-            request = Pine._create_request(Pine.IPCCommand.READ16, address, 9)
-        elif data_size is Pine.DataSize.INT32:
-            request = Pine._create_request(Pine.IPCCommand.READ32, address, 9)
-        elif data_size is Pine.DataSize.INT64:
-            request = Pine._create_request(Pine.IPCCommand.READ64, address, 9)
-        else:
+        try:
+            command = _READ_CMD[data_size]
+        except KeyError:
             raise ValueError(f"{data_size} is not a valid data size.")
 
-        if not self._sock_state:
-            self._init_socket()
-
+        self._send_request(self._create_request(command, address, 9))
+        end_length = self._recv_response()
+        return bytes(self._ret_mv[:end_length])
+
+    def read8(self, address: int) -> int:
+        """ Read an unsigned 8-bit value from PS2 memory. """
+        return self._read_sized(1, address)
+
+    def read16(self, address: int) -> int:
+        """ Read an unsigned 16-bit value from PS2 memory. """
+        return self._read_sized(2, address)
+
+    def read32(self, address: int) -> int:
+        """ Read an unsigned 32-bit value from PS2 memory. """
+        return self._read_sized(4, address)
+
+    def read64(self, address: int) -> int:
+        """ Read an unsigned 64-bit value from PS2 memory. """
+        return self._read_sized(8, address)
+
+    def _read_sized(self, data_size: int, address: int) -> int:
+        request = self._read_req[data_size]
+        _STRUCT_ADDR.pack_into(request, 5, address)
+        self._send_request(request)
+
+        # The reply size is known from the opcode, so ask for all of it in one recv
+        # instead of reading the length prefix first. A failure reply is shorter (no
+        # value), so the embedded length still decides how much to expect.
+        expected = _REPLY_LEN[data_size]
+        self._ensure_ret(_MIN_BUFFER_SIZE)
+        mv = self._ret_mv
         try:
-            self._sock.sendall(request)
-        except socket.error:
-            self._sock.close()
-            self._sock_state = False
-            raise ConnectionError("Lost connection to PCSX2.")
-
-        end_length = 4
-        result: bytes = b''
-        while len(result) < end_length:
-            try:
-                response = self._sock.recv(4096)
-            except TimeoutError:
-                raise TimeoutError("Response timed out. "
-                                   "This might be caused by having two PINE connections open on the same slot")
-
-            if len(response) <= 0:
-                result = b''
-                break
+            got = self._sock.recv_into(mv, expected)
+        except (TimeoutError, BlockingIOError, InterruptedError):
+            raise TimeoutError("Response timed out. "
+                               "This might be caused by having two PINE connections open on the same slot")
+        if got <= 0:
+            raise ConnectionError("Invalid response from PCSX2.")
+        if got < 4:
+            self._recv_exact(mv[got:4], 4 - got)
+            got = 4
+        end_length = _STRUCT_LEN.unpack_from(mv)[0]
+        if end_length < 5 or end_length > expected:
+            raise ConnectionError("Invalid response from PCSX2.")
+        if got < end_length:
+            self._recv_exact(mv[got:end_length], end_length - got)
 
-            result += response
+        if mv[4] == _IPC_FAIL:
+            raise ConnectionError("Failure indicated in PCSX2 response.")
+        if end_length != expected:
+            raise ConnectionError("Invalid response from PCSX2.")
+        return _TO[data_size].unpack_from(mv, 5)[0]
 
-            if end_length == 4 and len(response) >= 4:
-                end_length = Pine.from_array(result[0:4], 4)
-                if end_length > Pine.MAX_IPC_SIZE:
-                    result = b''
-                    break
+    def write(self, data_size: DataSize, address: int, data: int) -> None:
+        try:
+            command = _WRITE_CMD[data_size]
+        except KeyError:
+            raise ValueError(f"{data_size} is not a valid data size.")
 
-        if len(result) == 0:
+        # Header and payload are packed back to back into the preallocated buffer, so a
+        # plain sendall of the view hands the kernel one contiguous request with no
+        # per-call allocation; no scatter-gather needed.
+        _STRUCT_W[data_size].pack_into(self.ipc_buffer, 0, 9 + data_size, command, address, data)
+
+        self._send_request(self._ipc_mv[:9 + data_size])
+        self._recv_response()
+
+    def batch_read(self, ops: list[tuple[DataSize, int]]) -> list[int]:
+        """ Read several addresses in a single IPC round-trip. Takes (data_size, address)
+        pairs and returns the value read at each address, in order. """
+        if len(ops) > self.MAX_BATCH_REPLY_COUNT:
+            raise ValueError("Batch exceeds the maximum command count.")
+
+        self._ensure_ipc(4 + 5 * len(ops))
+        buf = self._ipc_buffer
+        arg_place = self.batch_arg_place
+        offset = 4
+        reply_offset = 5
+        # Locals for everything touched per iteration; global and attribute lookups in
+        # a 50,000-op loop are pure interpreter overhead.
+        size_index = _SIZE_INDEX
+        pack_into = _STRUCT_BATCH_R.pack_into
+        first_size = ops[0][0] if ops else 0
+        uniform = True
+        for i, (data_size, address) in enumerate(ops):
+            try:
+                command = size_index[data_size]
+            except KeyError:
+                raise ValueError(f"{data_size} is not a valid data size.")
+            pack_into(buf, offset, command, address)
+            offset += 5
+            arg_place[i] = reply_offset
+            reply_offset += data_size
+            if data_size != first_size:
+                uniform = False
+
+        if reply_offset > self.MAX_IPC_RETURN_SIZE:
+            raise ValueError("Batch reply would exceed the maximum reply size.")
+        _STRUCT_LEN.pack_into(buf, 0, offset)
+
+        self._send_request(self._ipc_mv[:offset])
+        # The reply length is fully determined by the ops; a mismatch would mean
+        # decoding stale bytes from an earlier reply.
+        if self._recv_response() != reply_offset:
             raise ConnectionError("Invalid response from PCSX2.")
-        if result[4] == Pine.IPCResult.IPC_FAIL:
-            raise ConnectionError("Failure indicated in PCSX2 response.")
 
-        return result
+        mv = self._ret_mv
+        if _np is not None and uniform and ops:
+            # Uniform widths mean the values sit back to back after the status byte;
+            # one frombuffer gather replaces len(ops) unpack calls.
+            return _np.frombuffer(mv, dtype=_NP_DTYPE[first_size], count=len(ops), offset=5).tolist()
+        codecs = _TO
+        return [codecs[data_size].unpack_from(mv, arg_place[i])[0]
+                for i, (data_size, _) in enumerate(ops)]
+
+    def batch_write(self, ops: list[tuple[DataSize, int, int]]) -> None:
+        """ Write several addresses in a single IPC round-trip. Takes
+        (data_size, address, data) triples. """
+        if len(ops) > self.MAX_BATCH_REPLY_COUNT:
+            raise ValueError("Batch exceeds the maximum command count.")
+
+        total = 4
+        for data_size, _, _ in ops:
+            total += 5 + data_size
+        if total > self.MAX_IPC_SIZE:
+            raise ValueError("Batch exceeds the maximum request size.")
+
+        self._ensure_ipc(total)
+        buf = self._ipc_buffer
+        offset = 4
+        size_index = _SIZE_INDEX
+        writers = _STRUCT_BATCH_W
+        for data_size, address, data in ops:
+            try:
+                command = 4 + size_index[data_size]
+            except KeyError:
+                raise ValueError(f"{data_size} is not a valid data size.")
+            writers[data_size].pack_into(buf, offset, command, address, data)
+            offset += 5 + data_size
 
-    def write(self, data_size: DataSize, address: int, data: int) -> None:
-        if data_size is Pine.DataSize.INT8:
-            request = Pine._create_request(Pine.IPCCommand.WRITE8, address, 9 + data_size)
-        elif data_size is Pine.DataSize.INT16:
-            request = Pine._create_request(Pine.IPCCommand.WRITE16, address, 9 + data_size)
-        elif data_size is Pine.DataSize.INT32:
-            request = Pine._create_request(Pine.IPCCommand.WRITE32, address, 9 + data_size)
-        elif data_size is Pine.DataSize.INT64:
-            request = Pine._create_request(Pine.IPCCommand.WRITE64, address, 9 + data_size)
-        else:
-            raise ValueError(f"{data_size} is not a valid data size.")
+        _STRUCT_LEN.pack_into(buf, 0, offset)
 
-        request += Pine.to_array(data, data_size)
+        self._send_request(self._ipc_mv[:offset])
+        self._recv_response()
 
-        if not self._sock_state:
+    def _send_request(self, request) -> None:
+        if self._sock is None:
             self._init_socket()
+            if self._sock is None:
+                raise ConnectionError("Lost connection to PCSX2.")
 
         try:
             self._sock.sendall(request)
         except socket.error:
             self._sock.close()
-            self._sock_state = False
+            self._sock = None
             raise ConnectionError("Lost connection to PCSX2.")
 
-        end_length = 4
-        result: bytes = b''
-        while len(result) < end_length:
+    def _recv_exact(self, mv: memoryview, n: int) -> None:
+        """ Receive exactly n bytes into the front of mv. """
+        recv_into = self._sock.recv_into
+        got = 0
+        while got < n:
             try:
-                response = self._sock.recv(4096)
-            except TimeoutError:
+                received = recv_into(mv[got:n], n - got, _MSG_WAITALL)
+            except (TimeoutError, BlockingIOError, InterruptedError):
+                # A kernel-side SO_RCVTIMEO expiry surfaces as EAGAIN rather than a
+                # Python-level timeout.
                 raise TimeoutError("Response timed out. "
                                    "This might be caused by having two PINE connections open on the same slot")
 
-            if len(response) <= 0:
-                result = b''
-                break
+            if received <= 0:
+                raise ConnectionError("Invalid response from PCSX2.")
+            got += received
+
+    def _recv_response(self) -> int:
+        """ Receive one IPC reply directly into ret_buffer and return its length. """
+        self._ensure_ret(_MIN_BUFFER_SIZE)
+        mv = self._ret_mv
+        self._recv_exact(mv, 4)
+        end_length = _STRUCT_LEN.unpack_from(mv)[0]
+        if end_length < 5 or end_length > Pine.MAX_IPC_RETURN_SIZE:
+            raise ConnectionError("Invalid response from PCSX2.")
+        # _ensure_ret preserves the prefix already received if it has to reallocate.
+        self._ensure_ret(end_length)
+        mv = self._ret_mv
+        self._recv_exact(mv[4:end_length], end_length - 4)
 
-            result += response
+        if mv[4] == _IPC_FAIL:
+            raise ConnectionError("Failure indicated in PCSX2 response.")
 
-            if end_length == 4 and len(response) >= 4:
-                end_length = Pine.from_array(result[0:4], 4)
-                if end_length > Pine.MAX_IPC_SIZE:
-                    result = b''
-                    break
+        return end_length
 
-        if len(result) == 0:
-            raise ConnectionError("Invalid response from PCSX2.")
-        if result[4] == Pine.IPCResult.IPC_FAIL:
-            raise ConnectionError("Failure indicated in PCSX2 response.")
+    def close(self) -> None:
+        """ Close the connection to PCSX2. """
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
 
+    def __enter__(self) -> "Pine":
+        return self
 
-    @staticmethod
-    def _create_request(command: IPCCommand, address: int, size: int = 0) -> bytes:
-        ipc = Pine.to_array(size, 4)
-        ipc += Pine.to_array(command, 1)
-        ipc += Pine.to_array(address, 4)
-        return ipc
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def _create_request(self, command: int, address: int, size: int = 0) -> memoryview:
+        _STRUCT_R.pack_into(self.ipc_buffer, 0, size, command, address)
+        return self._ipc_mv[:size]
 
     @staticmethod
     def to_array(value: int, size: int) -> bytes:
-        return value.to_bytes(length=size, byteorder="little")
+        return _TO[size].pack(value)
 
     @staticmethod
     def from_array(arr: bytes, size: int) -> int:
-        return int.from_bytes(arr, byteorder="little")
+        return _TO[size].unpack_from(arr)[0]
+
+
+_local = threading.local()
+
+
+def get_default(slot: int = 28011) -> Pine:
+    """ Return this thread's shared Pine instance for the given slot, creating it on
+    first use. Constructing a Pine allocates over 1 MB of buffers and opens a socket;
+    callers doing one-off operations should share an instance instead of paying that
+    per transaction. """
+    instances = getattr(_local, "instances", None)
+    if instances is None:
+        instances = _local.instances = {}
+    pine = instances.get(slot)
+    if pine is None:
+        pine = instances[slot] = Pine(slot)
+    return pine
 
 
 